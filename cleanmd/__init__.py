@@ -8,6 +8,7 @@ using Google's Gemini API.
 __version__ = "0.1.0"
 
 from cleanmd.config import Config, config
+from cleanmd.cache import ResultCache
 from cleanmd.cleaner import MarkdownCleaner
 from cleanmd.splitter import MarkdownSplitter
 from cleanmd.converter import MarkdownConverter
@@ -17,6 +18,7 @@ from cleanmd.processor import process_markdown
 __all__ = [
     "Config",
     "config",
+    "ResultCache",
     "MarkdownCleaner",
     "MarkdownSplitter",
     "MarkdownConverter",
@@ -2,13 +2,12 @@ import sys
 import os
 import asyncio
 from cleanmd import process_markdown
-import logging
-from pathlib import Path
-import argparse
-from typing import List, Optional
 
-# 配置日志
-logging.basicConfig(level=logging.INFO, format="%(message)s")
+try:
+    # 可选依赖：安装后使用基于 libuv 的事件循环，降低并发请求的调度开销
+    import uvloop
+except ImportError:
+    uvloop = None
 
 
 async def main():
@@ -46,4 +45,6 @@ async def main():
 
 
 if __name__ == "__main__":
+    if uvloop is not None:
+        sys.exit(uvloop.run(main()))
     sys.exit(asyncio.run(main()))
@@ -0,0 +1,104 @@
+"""
+清洗结果的磁盘缓存
+"""
+
+import json
+import time
+import random
+import hashlib
+import logging
+from pathlib import Path
+from typing import Optional, Union
+
+from cleanmd.utils import write_text_atomic
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    基于文件的结果缓存
+
+    主要职责:
+    1. 以内容哈希为键，每个条目保存为一个 JSON 文件
+    2. 为条目设置过期时间，过期后自动失效
+    """
+
+    def __init__(self, cache_dir: Union[str, Path], expire_seconds: float):
+        """
+        Args:
+            cache_dir: 缓存目录
+            expire_seconds: 条目默认有效期（秒）
+        """
+        self.cache_dir = Path(cache_dir)
+        self.expire_seconds = expire_seconds
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """
+        根据若干字符串生成缓存键
+
+        Args:
+            parts: 参与计算的字符串（模型、提示词等）
+
+        Returns:
+            str: SHA-256 十六进制摘要
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        读取缓存条目
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            Optional[str]: 缓存的内容，不存在或已过期时返回 None
+        """
+        entry_path = self._entry_path(key)
+        try:
+            entry = json.loads(entry_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+        # 文件内容是合法 JSON 但结构不符（被手动修改或损坏）时视为未命中
+        if not isinstance(entry, dict):
+            return None
+        expires_at = entry.get("expires_at")
+        value = entry.get("value")
+        if not isinstance(expires_at, (int, float)) or not isinstance(value, str):
+            return None
+
+        if expires_at <= time.time():
+            logger.debug("缓存已过期: %s", key)
+            try:
+                entry_path.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"删除过期缓存失败: {str(e)}")
+            return None
+
+        return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """
+        写入缓存条目
+
+        Args:
+            key: 缓存键
+            value: 缓存内容
+            ttl: 有效期（秒），默认使用 expire_seconds
+        """
+        ttl = self.expire_seconds if ttl is None else ttl
+        # 加入少量随机抖动，避免同一批写入的条目同时过期
+        expires_at = time.time() + ttl + random.uniform(0, ttl * 0.1)
+        entry = {"value": value, "expires_at": expires_at}
+        write_text_atomic(self._entry_path(key), json.dumps(entry, ensure_ascii=False))
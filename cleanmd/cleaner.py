@@ -1,15 +1,42 @@
+import re
+import json
 import time
 import logging
 import asyncio
-import google.generativeai as genai
-from typing import List, Tuple, Union
+from google.api_core import exceptions as google_exceptions
+from typing import List, Optional, Tuple, Union
 from cleanmd import config
 import os
 from pathlib import Path
-from .utils import count_text_length
+from .cache import ResultCache
+from .utils import count_text_length, write_text_atomic
 
 logger = logging.getLogger(__name__)
 
+# 系统提示词：定义AI的角色和行为，在创建模型时作为 system_instruction 传入
+SYSTEM_PROMPT = """你是一个专业的学术文本清洗助手。你的任务是清理和优化Markdown文本，同时严格遵守以下规则：
+1. 保持原文的核心内容不变
+2. 删除所有角标和引用说明
+3. 对于引用的文本内容使用 > 标记
+4. 保持章节结构和层级关系
+5. 直接返回清洗后的文本，不要添加任何解释或说明
+6. 保持Markdown格式
+"""
+
+# 句末标点：超长的单行优先在这些位置切分（英文标点需后接空白，避免切开小数、缩写）
+SENTENCE_END_PATTERN = re.compile(r"[。！？]|[.!?](?=\s)")
+
+# 可重试的临时性错误（超时、限流、服务端故障），其余错误重试也不会成功。
+# REST 传输下 HTTP 429/504 映射为 TooManyRequests/GatewayTimeout，
+# gRPC 下的 ResourceExhausted/DeadlineExceeded 分别是它们的子类
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    google_exceptions.GatewayTimeout,
+    google_exceptions.InternalServerError,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+)
+
 
 class MarkdownCleaner:
     """
@@ -21,12 +48,26 @@ class MarkdownCleaner:
     3. 保存清洗结果
     """
 
-    def __init__(self):
+    def __init__(self, max_concurrency: Optional[int] = None):
+        """
+        Args:
+            max_concurrency: 同时进行的 API 请求数上限，默认使用配置中的值
+        """
         self._init_gemini_config()
+        self.semaphore = asyncio.Semaphore(
+            max_concurrency or config.MAX_CONCURRENT_REQUESTS
+        )
         self.output_dir = os.path.join(config.OUTPUT_DIR, config.CLEANED_DIR)
+        self.cache = ResultCache(
+            os.path.join(config.OUTPUT_DIR, config.CACHE_DIR),
+            config.CACHE_EXPIRE_SECONDS,
+        )
 
     def _init_gemini_config(self):
         """初始化 Gemini API 配置"""
+        # 延迟导入 SDK：导入耗时约半秒，只在真正创建清洗器时才需要
+        import google.generativeai as genai
+
         genai.configure(api_key=config.API_KEY)
         generation_config = {
             "temperature": config.TEMPERATURE,
@@ -34,38 +75,92 @@ class MarkdownCleaner:
             "top_k": config.TOP_K,
             "max_output_tokens": config.MAX_TOKENS,
         }
+        self.generation_config = generation_config
         self.model = genai.GenerativeModel(
-            config.MODEL, generation_config=generation_config
+            config.MODEL,
+            generation_config=generation_config,
+            system_instruction=SYSTEM_PROMPT,
         )
         self.max_retries = config.MAX_RETRIES
         self.retry_delay = config.RETRY_DELAY
+        self.max_block_chars = config.MAX_BLOCK_CHARS
 
-    async def clean_chunk_async(self, context: str, content: str) -> str:
+    async def clean_chunk_async(
+        self, context: str, content: str, label: str = "文本块"
+    ) -> str:
         """
         异步清洗单个文本块
 
         Args:
             context: 文本块的上下文（前文）
             content: 需要清洗的文本内容
+            label: 日志中显示的文本块名称（如 "分段 3/10"）
 
         Returns:
             str: 清洗后的文本
         """
-        logger.debug(f"开始清洗文本块，上下文: {context[:50]}...")
-        prompts = self._create_prompt(context, content)
+        if not content.strip():
+            # 空白内容无需清洗，避免一次无意义的 API 调用
+            return content
+
+        if len(content) > self.max_block_chars:
+            # 过长的文本块拆分后并发清洗，每个片段独立重试，
+            # 并以前一个片段的原文作为上下文
+            fragments = self._split_long_content(content)
+            logger.info(
+                f"文本块过长({len(content)} 字符)，拆分为 {len(fragments)} 个片段清洗"
+            )
+            contexts = [context] + [fragment for fragment, _ in fragments[:-1]]
+            cleaned_fragments = await asyncio.gather(
+                *(
+                    self.clean_chunk_async(
+                        fragment_context,
+                        fragment,
+                        f"{label} 片段 {k}/{len(fragments)}",
+                    )
+                    for k, (fragment_context, (fragment, _)) in enumerate(
+                        zip(contexts, fragments), 1
+                    )
+                )
+            )
+            return "".join(
+                cleaned + separator
+                for cleaned, (_, separator) in zip(cleaned_fragments, fragments)
+            )
 
-        for attempt in range(self.max_retries):
-            try:
-                logger.debug(f"调用Gemini API (尝试 {attempt + 1}/{self.max_retries})")
+        # 调试日志使用惰性格式化，未开启 DEBUG 时不产生格式化开销
+        logger.debug("开始清洗文本块，上下文: %s...", context[:50])
+        prompt = self._create_prompt(context, content)
 
-                # 创建新的对话
-                chat = self.model.start_chat(history=[])
+        # 相同模型、参数和提示词的清洗结果直接从缓存读取
+        cache_key = ResultCache.make_key(
+            config.MODEL,
+            json.dumps(self.generation_config, sort_keys=True),
+            SYSTEM_PROMPT,
+            prompt,
+        )
+        cached_text = await asyncio.to_thread(self.cache.get, cache_key)
+        if cached_text is not None:
+            logger.info(f"{label} 命中缓存，跳过API调用")
+            return cached_text
 
-                # 发送系统提示词
-                response = await chat.send_message_async(prompts["system"])
+        for attempt in range(self.max_retries):
+            try:
+                logger.debug(
+                    "调用Gemini API (尝试 %d/%d)", attempt + 1, self.max_retries
+                )
 
-                # 发送用户提示词
-                response = await chat.send_message_async(prompts["user"])
+                # 系统提示词已在模型中配置，单次请求即可完成清洗；
+                # 信号量只包住请求本身，重试等待期间不占用并发名额。
+                # 排队时间和请求耗时分开记录，便于评估并发数设置
+                queued_at = time.perf_counter()
+                async with self.semaphore:
+                    wait_time = time.perf_counter() - queued_at
+                    logger.info(f"处理{label}（排队 {wait_time:.1f} 秒）...")
+                    start_time = time.perf_counter()
+                    response = await self.model.generate_content_async(prompt)
+                    request_time = time.perf_counter() - start_time
+                logger.info(f"{label} 请求完成，耗时 {request_time:.1f} 秒")
 
                 if response.text:
                     cleaned_text = response.text.strip()
@@ -81,9 +176,19 @@ class MarkdownCleaner:
                     )
                     print("=" * 50 + "\n")
 
+                    # 只缓存正常结束的结果；被 max_output_tokens 截断的输出
+                    # 和失败时返回的原文下次仍会重新清洗
+                    finish_reason = self._get_finish_reason(response)
+                    if finish_reason == "STOP":
+                        await self._save_to_cache(cache_key, cleaned_text)
+                    else:
+                        logger.warning(
+                            f"响应未正常结束(finish_reason={finish_reason})，"
+                            f"结果可能不完整，不写入缓存"
+                        )
                     return cleaned_text
 
-            except Exception as e:
+            except RETRYABLE_ERRORS as e:
                 logger.warning(
                     f"API调用失败 (尝试 {attempt + 1}/{self.max_retries}): {str(e)}"
                 )
@@ -93,8 +198,118 @@ class MarkdownCleaner:
                     logger.error("达到最大重试次数，返回原始内容")
                     return content
 
+            except Exception as e:
+                # 参数错误、内容被安全策略拦截等无法通过重试恢复，直接放弃
+                logger.error(f"API调用失败且不可重试，返回原始内容: {str(e)}")
+                return content
+
         return content
 
+    async def _save_to_cache(self, key: str, text: str) -> None:
+        """
+        将清洗结果写入缓存，写入失败只记录警告
+
+        缓存只是加速手段，磁盘已满、目录只读等错误不应让已经成功的清洗结果作废。
+
+        Args:
+            key: 缓存键
+            text: 清洗后的文本
+        """
+        try:
+            await asyncio.to_thread(self.cache.set, key, text)
+        except OSError as e:
+            logger.warning(f"写入缓存失败，本次结果不缓存: {str(e)}")
+
+    @staticmethod
+    def _get_finish_reason(response) -> Optional[str]:
+        """
+        获取响应中第一个候选结果的结束原因
+
+        Args:
+            response: generate_content_async 返回的响应
+
+        Returns:
+            Optional[str]: 结束原因名称（如 STOP、MAX_TOKENS），无候选结果时返回 None
+        """
+        candidates = getattr(response, "candidates", None)
+        if not candidates:
+            return None
+        return getattr(candidates[0].finish_reason, "name", None)
+
+    def _split_long_content(self, content: str) -> List[Tuple[str, str]]:
+        """
+        将过长的文本切分为不超过 max_block_chars 的片段
+
+        优先按行合并；单行超长时在句末标点处切分，找不到句末标点时才按长度硬切分。
+
+        Args:
+            content: 需要切分的文本内容
+
+        Returns:
+            List[Tuple[str, str]]: (片段, 与下一片段之间的连接符) 列表，
+                不同行之间用空行连接，同一行切出的片段之间不插入空行
+        """
+        limit = self.max_block_chars
+        fragments = []
+        current_lines = []
+        current_size = 0
+
+        for line in content.split("\n"):
+            if current_lines and current_size + len(line) + 1 > limit:
+                fragments.append(("\n".join(current_lines), "\n\n"))
+                current_lines = []
+                current_size = 0
+
+            if len(line) > limit:
+                fragments.extend(self._split_long_line(line))
+                continue
+
+            current_lines.append(line)
+            current_size += len(line) + 1
+
+        if current_lines:
+            fragments.append(("\n".join(current_lines), "\n\n"))
+
+        # 最后一个片段之后不需要连接符
+        if fragments:
+            fragments[-1] = (fragments[-1][0], "")
+
+        return fragments
+
+    def _split_long_line(self, line: str) -> List[Tuple[str, str]]:
+        """
+        切分超过 max_block_chars 的单行文本
+
+        Args:
+            line: 需要切分的单行文本
+
+        Returns:
+            List[Tuple[str, str]]: (片段, 与下一片段之间的连接符) 列表
+        """
+        limit = self.max_block_chars
+        pieces = []
+
+        while len(line) > limit:
+            cut = 0
+            for match in SENTENCE_END_PATTERN.finditer(line, 0, limit):
+                cut = match.end()
+            if cut == 0:
+                # 窗口内没有句末标点，只能按长度硬切分
+                cut = limit
+
+            piece, rest = line[:cut], line[cut:].lstrip()
+            # 切分处原有的空白（英文句间空格）在拼接时还原
+            separator = " " if len(rest) < len(line) - cut else ""
+            pieces.append((piece, separator))
+            line = rest
+
+        if line:
+            pieces.append((line, "\n\n"))
+        elif pieces:
+            pieces[-1] = (pieces[-1][0], "\n\n")
+
+        return pieces
+
     def _create_prompt(self, context: str, content: str) -> str:
         """
         创建提示词
@@ -104,18 +319,8 @@ class MarkdownCleaner:
             content: 需要清洗的文本内容
 
         Returns:
-            str: 格式化的提示词
+            str: 格式化的用户提示词（系统提示词见 SYSTEM_PROMPT）
         """
-        # 系统提示词：定义AI的角色和行为
-        system_prompt = """你是一个专业的学术文本清洗助手。你的任务是清理和优化Markdown文本，同时严格遵守以下规则：
-1. 保持原文的核心内容不变
-2. 删除所有角标和引用说明
-3. 对于引用的文本内容使用 > 标记
-4. 保持章节结构和层级关系
-5. 直接返回清洗后的文本，不要添加任何解释或说明
-6. 保持Markdown格式
-"""
-
         # 用户提示词：具体的任务要求
         user_prompt = f"""请帮我清理和优化以下Markdown文本，重点关注:
 
@@ -151,15 +356,13 @@ class MarkdownCleaner:
 待清洗文本:
 {content}"""
 
-        # 返回完整的提示词
-        return {"system": system_prompt, "user": user_prompt}
+        return user_prompt
 
     async def clean_markdown_async(
         self, chunks: List[Tuple[str, str]], original_path: str
     ) -> str:
         """异步清洗所有文本块"""
         logger.info(f"开始清洗文件: {original_path}")
-        cleaned_chunks = []
         total_chunks = len(chunks)
 
         # 计算总字数用于进度显示
@@ -170,23 +373,32 @@ class MarkdownCleaner:
         temp_dir = Path(self.output_dir) / config.CLEANED_DIR / "chunks"
         temp_dir.mkdir(parents=True, exist_ok=True)
 
-        for i, (context, content) in enumerate(chunks, 1):
+        # 并发处理各片段，同时进行的 API 请求数由 self.semaphore 限制
+        async def process(i: int, context: str, content: str) -> str:
+            nonlocal processed_chars
             try:
                 # 尝试清洗当前片段
                 cleaned_chunk = await self._process_chunk(
                     i, total_chunks, context, content, temp_dir
                 )
-                cleaned_chunks.append(cleaned_chunk)
-
-                # 更新进度
-                processed_chars += len(content)
-                progress = (processed_chars / total_chars) * 100
-                print(f"\n总体进度: {progress:.1f}%")
-
             except Exception as e:
                 logger.error(f"处理第 {i} 个段时出错: {str(e)}")
-                cleaned_chunks.append(content)
                 print(f"处理出错! 保留原内容")
+                return content
+
+            # 更新进度
+            processed_chars += len(content)
+            progress = (processed_chars / total_chars) * 100
+            print(f"\n总体进度: {progress:.1f}%")
+            return cleaned_chunk
+
+        # gather 按输入顺序返回结果，保证合并顺序不变
+        cleaned_chunks = await asyncio.gather(
+            *(
+                process(i, context, content)
+                for i, (context, content) in enumerate(chunks, 1)
+            )
+        )
 
         # 合并和保存结果
         return self._save_results(cleaned_chunks, original_path, temp_dir, total_chunks)
@@ -260,7 +472,7 @@ class MarkdownCleaner:
         """保存处理后的文本块"""
         # 保存当前片段
         chunk_file = temp_dir / f"chunk_{str(chunk_num).zfill(3)}.md"
-        chunk_file.write_text(content, encoding="utf-8")
+        await asyncio.to_thread(write_text_atomic, chunk_file, content)
 
         # 打印处理结果
         print(
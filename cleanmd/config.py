@@ -2,13 +2,23 @@ import os
 import logging
 from dotenv import load_dotenv
 
-# 配置日志
+# 配置日志（可通过 CLEANMD_LOG_LEVEL 环境变量调整，例如 DEBUG）
+LOG_LEVEL = (os.getenv("CLEANMD_LOG_LEVEL") or "INFO").upper()
+# 无法识别的级别名称回退到 INFO，避免导入时 basicConfig 抛出 ValueError
+_invalid_log_level = not isinstance(logging.getLevelName(LOG_LEVEL), int)
+if _invalid_log_level:
+    LOG_LEVEL = "INFO"
 logging.basicConfig(
-    level=logging.INFO,
+    level=LOG_LEVEL,
     format="%(asctime)s - %(levelname)s - %(message)s",
     datefmt="%Y-%m-%d %H:%M:%S",
 )
 logger = logging.getLogger(__name__)
+if _invalid_log_level:
+    logger.warning(
+        f"无法识别的日志级别 CLEANMD_LOG_LEVEL={os.getenv('CLEANMD_LOG_LEVEL')}，"
+        f"使用 INFO"
+    )
 
 # 加载环境变量
 load_dotenv()
@@ -25,12 +35,17 @@ GEMINI_MODEL = "gemini-2.0-flash-exp"  # 更新为最新的 Flash 模型
 TEMPERATURE = 0.6  # 较低的温度以保持输出的一致性
 TOP_P = 1
 TOP_K = 40
+MAX_TOKENS = 8192  # 单次响应的最大输出 token 数（Flash 模型的输出上限）
 logger.info(f"使用模型: {GEMINI_MODEL}")
 
 # 文本分段配置
 MAX_CHUNK_SIZE = 3000  # 调整为描述文档中的值
 MIN_CHUNK_SIZE = 2000  # 调整为描述文档中的值
 TARGET_RATIO = 0.8  # 目标分块大小比例(相对于最大值)
+# 单次发送给 Gemini 的最大字符数，超出时拆分后并发清洗。
+# 中文约 1 字 1 token，清洗后长度与原文相近，按输出上限的 3/4 留出余量，避免被截断；
+# 该值需明显大于分段大小，正常分段不会再被拆分，只处理异常超长的文本块
+MAX_BLOCK_CHARS = MAX_TOKENS * 3 // 4
 logger.info(
     f"分段大小配置: 最大={MAX_CHUNK_SIZE}, 最小={MIN_CHUNK_SIZE}, 目标比例={TARGET_RATIO}"
 )
@@ -42,7 +57,11 @@ MARKDOWN_SEPARATORS = ["---", "***", "___"]
 # API请求配置
 API_RETRY_DELAY = 70  # 调整为描述文档中的值
 MAX_RETRIES = 5  # 最大重试次数（符合描述）
-logger.info(f"API配置: 重试次数={MAX_RETRIES}, 重试延迟={API_RETRY_DELAY}秒")
+MAX_CONCURRENT_REQUESTS = 4  # 同时进行的 API 请求数上限
+logger.info(
+    f"API配置: 重试次数={MAX_RETRIES}, 重试延迟={API_RETRY_DELAY}秒, "
+    f"并发数={MAX_CONCURRENT_REQUESTS}"
+)
 
 # EPUB转换配置
 EPUB_CONFIG = {
@@ -58,6 +77,8 @@ EPUB_CONFIG = {
 OUTPUT_DIR = "output"  # 主输出目录
 CHUNKS_DIR = "chunks"  # 分段结果目录
 CLEANED_DIR = "cleaned"  # 清洗结果目录
+CACHE_DIR = "cache"  # API 结果缓存目录
+CACHE_EXPIRE_SECONDS = 7 * 24 * 3600  # 缓存有效期（秒）
 OUTPUT_SUFFIX = "_cleaned"  # 清洗后文件的后缀
 EPUB_SUFFIX = "_final"  # EPUB文件后缀
 
@@ -85,18 +106,20 @@ class Config:
         self.TEMPERATURE = TEMPERATURE
         self.TOP_P = TOP_P
         self.TOP_K = TOP_K
-        self.MAX_TOKENS = 2048
+        self.MAX_TOKENS = MAX_TOKENS
 
         # 分段配置
         self.MAX_CHUNK_SIZE = MAX_CHUNK_SIZE
         self.MIN_CHUNK_SIZE = MIN_CHUNK_SIZE
         self.TARGET_RATIO = TARGET_RATIO
+        self.MAX_BLOCK_CHARS = MAX_BLOCK_CHARS
         self.MARKDOWN_HEADERS = MARKDOWN_HEADERS
         self.MARKDOWN_SEPARATORS = MARKDOWN_SEPARATORS
 
         # API 重试配置
         self.MAX_RETRIES = MAX_RETRIES
         self.RETRY_DELAY = API_RETRY_DELAY
+        self.MAX_CONCURRENT_REQUESTS = MAX_CONCURRENT_REQUESTS
 
         # EPUB转换配置
         self.EPUB_CONFIG = EPUB_CONFIG
@@ -106,6 +129,8 @@ class Config:
         self.OUTPUT_DIR = OUTPUT_DIR
         self.CHUNKS_DIR = CHUNKS_DIR
         self.CLEANED_DIR = CLEANED_DIR
+        self.CACHE_DIR = CACHE_DIR
+        self.CACHE_EXPIRE_SECONDS = CACHE_EXPIRE_SECONDS
         self.OUTPUT_SUFFIX = OUTPUT_SUFFIX
 
     def check_pandoc(self):
@@ -3,12 +3,11 @@ import argparse
 import logging
 import sys
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict
 
 from cleanmd.converter import MarkdownConverter
 
-# 配置日志
-logging.basicConfig(level=logging.INFO, format="%(message)s")
+# 日志格式统一由 cleanmd.config 配置
 logger = logging.getLogger(__name__)
 
 
@@ -3,13 +3,15 @@
 """
 
 import os
+import shutil
+import asyncio
 import logging
 from pathlib import Path
-from typing import Optional
 
 from cleanmd.splitter import MarkdownSplitter
 from cleanmd.cleaner import MarkdownCleaner
 from cleanmd.converter import MarkdownConverter
+from cleanmd.utils import write_text_atomic
 from cleanmd import config
 
 # 配置日志
@@ -35,7 +37,8 @@ async def process_markdown(input_file: str) -> int:
         chunks_dir = os.path.join(base_output_dir, config.CHUNKS_DIR)
         cleaned_dir = os.path.join(base_output_dir, config.CLEANED_DIR)
 
-        for dir_path in [base_output_dir, chunks_dir, cleaned_dir]:
+        # makedirs 会同时创建上级的基础输出目录
+        for dir_path in [chunks_dir, cleaned_dir]:
             os.makedirs(dir_path, exist_ok=True)
             logger.info(f"创建目录: {dir_path}")
 
@@ -47,50 +50,61 @@ async def process_markdown(input_file: str) -> int:
         # 修改：最终文件放在项目目录下
         final_output_file = os.path.join(base_output_dir, f"{file_stem}_final.md")
 
-        # 读取输入文件
-        with open(input_file, "r", encoding="utf-8") as f:
-            content = f.read()
+        # 读取输入文件（在线程中读取，避免大文件阻塞事件循环）
+        content = await asyncio.to_thread(Path(input_file).read_text, encoding="utf-8")
 
-        # 备份原始文件
-        with open(original_file, "w", encoding="utf-8") as f:
-            f.write(content)
-
-        # 初始化组件
-        splitter = MarkdownSplitter()
-        cleaner = MarkdownCleaner()
+        # 备份原始文件（直接复制文件，无需再次编码写出内容）
+        await asyncio.to_thread(shutil.copyfile, input_file, original_file)
 
         # 分割内容
+        splitter = MarkdownSplitter()
         chunks = splitter.split_markdown(content)
 
-        # 保存分段结果
-        with open(chunks_file, "w", encoding="utf-8") as f:
-            for i, chunk in enumerate(chunks, 1):
-                f.write(f"\n\n{'='*50}\n分段 {i}:\n{'-'*50}\n{chunk}\n")
+        # 空文档无需调用 API 和 pandoc，直接结束（不生成清洗结果和 EPUB）
+        if not chunks:
+            logger.warning(f"输入文件没有可处理的内容，跳过清洗和转换: {input_file}")
+            return 0
 
-        # 清理每个分段
-        cleaned_chunks = []
-        for i, (context, content) in enumerate(chunks, 1):
-            logger.info(f"\n处理分段 {i}/{len(chunks)}...")
-            cleaned_chunk = await cleaner.clean_chunk_async(context, content)
+        # 确认有内容后再初始化清理器（会配置 Gemini 客户端）
+        cleaner = MarkdownCleaner()
 
-            # 将每个处��后的分段保存到cleaned目录
+        # 保存分段结果（先拼接成完整文本，再一次性写入）
+        chunks_text = "".join(
+            f"\n\n{'='*50}\n分段 {i}:\n{'-'*50}\n{chunk}\n"
+            for i, chunk in enumerate(chunks, 1)
+        )
+        await asyncio.to_thread(write_text_atomic, chunks_file, chunks_text)
+
+        # 并发清理各分段，同时进行的 API 请求数由 cleaner 的信号量限制
+        async def clean_chunk(i: int, context: str, content: str) -> str:
+            # 开始处理和请求耗时的日志由 cleaner 在取得并发名额后输出
+            cleaned_chunk = await cleaner.clean_chunk_async(
+                context, content, f"分段 {i}/{len(chunks)}"
+            )
+
+            # 将每个处理后的分段保存到cleaned目录
             chunk_file = os.path.join(cleaned_dir, f"chunk_{str(i).zfill(3)}.md")
-            with open(chunk_file, "w", encoding="utf-8") as f:
-                f.write(cleaned_chunk)
+            await asyncio.to_thread(write_text_atomic, chunk_file, cleaned_chunk)
             logger.info(f"分段 {i} 已保存到: {chunk_file}")
 
-            cleaned_chunks.append(cleaned_chunk)
+            return cleaned_chunk
+
+        # gather 按输入顺序返回结果，保证合并后的段落顺序不变
+        cleaned_chunks = await asyncio.gather(
+            *(
+                clean_chunk(i, context, chunk_content)
+                for i, (context, chunk_content) in enumerate(chunks, 1)
+            )
+        )
 
         # 合并清理后的内容
         cleaned_content = "\n\n".join(cleaned_chunks)
 
         # 保存清理后的文件到cleaned目录
-        with open(cleaned_file, "w", encoding="utf-8") as f:
-            f.write(cleaned_content)
+        await asyncio.to_thread(write_text_atomic, cleaned_file, cleaned_content)
 
-        # 保存最终结果到项目根目录
-        with open(final_output_file, "w", encoding="utf-8") as f:
-            f.write(cleaned_content)
+        # 保存最终结果到项目根目录（内容与清理后的文件相同，直接复制）
+        await asyncio.to_thread(shutil.copyfile, cleaned_file, final_output_file)
 
         # 新增：转换为EPUB
         converter = MarkdownConverter()
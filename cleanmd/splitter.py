@@ -1,6 +1,5 @@
-import re
 import logging
-from typing import List, Tuple, Dict
+from typing import List, Tuple
 from cleanmd import config
 
 logger = logging.getLogger(__name__)
@@ -10,6 +9,8 @@ class MarkdownSplitter:
     def __init__(self):
         """初始化分段器,加载配置"""
         self.headers = config.MARKDOWN_HEADERS
+        # str.startswith 接受元组，一次调用即可匹配所有标题前缀
+        self.header_prefixes = tuple(self.headers)
         self.separators = config.MARKDOWN_SEPARATORS
         self.max_chunk_size = config.MAX_CHUNK_SIZE
         self.min_chunk_size = config.MIN_CHUNK_SIZE
@@ -45,7 +46,7 @@ class MarkdownSplitter:
         last_header_line = None
 
         for line in lines:
-            is_header = any(line.startswith(header) for header in self.headers)
+            is_header = line.startswith(self.header_prefixes)
 
             if is_header:
                 # 如果有上一个标题但没有内容，将上一个标题加入当前行
@@ -146,4 +147,4 @@ class MarkdownSplitter:
             return False
         # 段落应该以空行或标题结束
         last_line = lines[-1].strip()
-        return (not last_line) or any(last_line.startswith(h) for h in self.headers)
+        return (not last_line) or last_line.startswith(self.header_prefixes)
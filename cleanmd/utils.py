@@ -1,10 +1,18 @@
+import os
 import re
+import asyncio
 import logging
+import tempfile
 from functools import wraps
+from pathlib import Path
 from typing import Callable, Any, Union
 
 logger = logging.getLogger(__name__)
 
+# 统计文本长度时使用的正则，模块加载时编译一次
+MARKDOWN_PATTERN = re.compile(r"(?<!\\)([*_~`#>|\[\]\(\)\{\}]|^#+ )")
+CHINESE_PATTERN = re.compile(r"[\u4e00-\u9fff]")
+
 
 def log_operation(operation: str) -> Callable:
     """日志装饰器
@@ -54,21 +62,47 @@ def count_text_length(text: str) -> int:
         文本长度(中文字符计2,其他字符计1)
     """
     # 移除Markdown标记
-    markdown_pattern = r"(?<!\\)([*_~`#>|\[\]\(\)\{\}]|^#+ )"
-    clean_text = re.sub(markdown_pattern, "", text)
+    clean_text = MARKDOWN_PATTERN.sub("", text)
 
-    # 计算中文字符(每个计2)
-    chinese_pattern = r"[\u4e00-\u9fff]"
-    chinese_chars = re.findall(chinese_pattern, clean_text)
-    chinese_length = len(chinese_chars) * 2
+    # 计算中文字符(每个计2)，subn 一次扫描同时完成计数和移除
+    remaining_text, chinese_count = CHINESE_PATTERN.subn("", clean_text)
+    chinese_length = chinese_count * 2
 
-    # 计算其他字符(每个计1)
-    remaining_text = re.sub(chinese_pattern, "", clean_text)
-    other_length = len("".join(c for c in remaining_text if c.strip()))
+    # 计算其他字符(每个计1)，split() 在 C 层去除所有空白字符
+    other_length = len("".join(remaining_text.split()))
 
     return chinese_length + other_length
 
 
+def write_text_atomic(path: Union[str, Path], content: str) -> None:
+    """原子写入文本文件
+
+    先写入同目录下的临时文件，再用 os.replace 替换目标文件，
+    中途中断时不会留下写了一半的文件。临时文件名由 mkstemp 生成，
+    多个线程同时写入同一目标时互不干扰；写入失败时删除临时文件。
+
+    Args:
+        path: 目标文件路径
+        content: 写入内容
+    """
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=path.parent, prefix=path.name + ".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        # mkstemp 创建的文件权限为 0600，改为普通文件的权限
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
 class ProgressBar:
     """进度条显示类"""
 
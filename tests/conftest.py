@@ -0,0 +1,4 @@
+import os
+
+# 导入 cleanmd.config 时要求存在 API Key；单元测试不会真正调用 Gemini
+os.environ.setdefault("GEMINI_API_KEY", "test_key")
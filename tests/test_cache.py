@@ -0,0 +1,62 @@
+import json
+from pathlib import Path
+
+from cleanmd.cache import ResultCache
+
+
+def test_set_and_get(tmp_path):
+    cache = ResultCache(tmp_path, expire_seconds=60)
+    key = ResultCache.make_key("model", "prompt")
+
+    cache.set(key, "清洗结果")
+
+    assert cache.get(key) == "清洗结果"
+
+
+def test_make_key_separates_parts():
+    assert ResultCache.make_key("ab", "c") != ResultCache.make_key("a", "bc")
+
+
+def test_missing_entry_returns_none(tmp_path):
+    cache = ResultCache(tmp_path, expire_seconds=60)
+
+    assert cache.get(ResultCache.make_key("missing")) is None
+
+
+def test_expired_entry_is_removed(tmp_path):
+    cache = ResultCache(tmp_path, expire_seconds=60)
+    key = ResultCache.make_key("model", "prompt")
+
+    cache.set(key, "清洗结果", ttl=0)
+
+    assert cache.get(key) is None
+    assert not (tmp_path / f"{key}.json").exists()
+
+
+def test_expired_entry_unlink_failure_is_a_miss(tmp_path, monkeypatch):
+    cache = ResultCache(tmp_path, expire_seconds=60)
+    key = ResultCache.make_key("model", "prompt")
+    cache.set(key, "清洗结果", ttl=0)
+
+    def failing_unlink(self, missing_ok=False):
+        raise PermissionError("read-only")
+
+    monkeypatch.setattr(Path, "unlink", failing_unlink)
+
+    assert cache.get(key) is None
+
+
+def test_corrupt_entries_return_none(tmp_path):
+    cache = ResultCache(tmp_path, expire_seconds=60)
+    entries = {
+        "invalid": "{not json",
+        "list": json.dumps([1, 2]),
+        "bad_expiry": json.dumps({"value": "清洗结果", "expires_at": "soon"}),
+        "bad_value": json.dumps({"value": 42, "expires_at": 9999999999}),
+        "missing_fields": json.dumps({}),
+    }
+    for name, text in entries.items():
+        key = ResultCache.make_key(name)
+        (tmp_path / f"{key}.json").write_text(text, encoding="utf-8")
+
+        assert cache.get(key) is None, name
@@ -0,0 +1,188 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from cleanmd import config
+from cleanmd.cache import ResultCache
+from cleanmd.cleaner import MarkdownCleaner
+from cleanmd.splitter import MarkdownSplitter
+
+
+def make_cleaner(max_block_chars: int) -> MarkdownCleaner:
+    """创建只用于切分测试的清洗器，不初始化 Gemini 客户端"""
+    cleaner = MarkdownCleaner.__new__(MarkdownCleaner)
+    cleaner.max_block_chars = max_block_chars
+    return cleaner
+
+
+def make_response(text: str, finish_reason: str = "STOP") -> SimpleNamespace:
+    """构造与 Gemini 响应结构一致的桩对象"""
+    candidate = SimpleNamespace(finish_reason=SimpleNamespace(name=finish_reason))
+    return SimpleNamespace(text=text, candidates=[candidate])
+
+
+class StubModel:
+    """按顺序返回预设结果的桩模型，结果为异常实例时抛出该异常"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    async def generate_content_async(self, prompt):
+        result = self.results[min(self.calls, len(self.results) - 1)]
+        self.calls += 1
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def make_api_cleaner(tmp_path, model: StubModel) -> MarkdownCleaner:
+    """创建使用桩模型和临时缓存目录的清洗器"""
+    cleaner = make_cleaner(max_block_chars=10000)
+    cleaner.model = model
+    cleaner.generation_config = {}
+    cleaner.semaphore = asyncio.Semaphore(1)
+    cleaner.cache = ResultCache(tmp_path, expire_seconds=60)
+    cleaner.max_retries = 3
+    cleaner.retry_delay = 0
+    return cleaner
+
+
+def join_fragments(fragments):
+    return "".join(fragment + separator for fragment, separator in fragments)
+
+
+def test_split_groups_lines_within_limit():
+    cleaner = make_cleaner(20)
+    content = "\n".join(["第一行内容", "第二行内容", "第三行内容", "第四行内容"])
+
+    fragments = cleaner._split_long_content(content)
+
+    assert all(len(fragment) <= 20 for fragment, _ in fragments)
+    assert [separator for _, separator in fragments] == ["\n\n", ""]
+    assert fragments[0][0] == "第一行内容\n第二行内容\n第三行内容"
+
+
+def test_split_long_line_at_sentence_end():
+    cleaner = make_cleaner(15)
+    line = "这是第一句话。这是第二句话，比较长一些。这是第三句话！"
+
+    fragments = cleaner._split_long_content(line)
+
+    assert [fragment for fragment, _ in fragments] == [
+        "这是第一句话。",
+        "这是第二句话，比较长一些。",
+        "这是第三句话！",
+    ]
+    # 同一行切出的片段之间不插入空行
+    assert join_fragments(fragments) == line
+
+
+def test_split_english_line_restores_space():
+    cleaner = make_cleaner(30)
+    line = "The first sentence is here. Version 3.14 is the second one."
+
+    fragments = cleaner._split_long_content(line)
+
+    assert fragments[0] == ("The first sentence is here.", " ")
+    assert join_fragments(fragments) == line
+
+
+def test_split_hard_cut_without_sentence_end():
+    cleaner = make_cleaner(10)
+    line = "甲" * 25
+
+    fragments = cleaner._split_long_content(line)
+
+    assert [len(fragment) for fragment, _ in fragments] == [10, 10, 5]
+    assert join_fragments(fragments) == line
+
+
+def test_split_long_line_between_normal_lines():
+    cleaner = make_cleaner(10)
+    content = "标题\n" + "一二三四五。六七八九十。" + "\n结尾"
+
+    fragments = cleaner._split_long_content(content)
+
+    assert fragments == [
+        ("标题", "\n\n"),
+        ("一二三四五。", ""),
+        ("六七八九十。", "\n\n"),
+        ("结尾", ""),
+    ]
+
+
+def test_normal_chunks_are_not_split_again():
+    # 分段器产生的正常分段不应触发清洗器的二次拆分
+    content = "".join(
+        f"# 第{i}章\n\n" + ("这是一段测试文字。" * 40 + "\n") * 8 for i in range(5)
+    )
+    chunks = MarkdownSplitter().split_markdown(content)
+
+    assert all(len(chunk) <= config.MAX_BLOCK_CHARS for _, chunk in chunks)
+
+
+async def test_cache_write_failure_keeps_cleaned_text(tmp_path, monkeypatch):
+    cleaner = make_api_cleaner(tmp_path, StubModel(make_response("清洗结果")))
+
+    def failing_set(key, value, ttl=None):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(cleaner.cache, "set", failing_set)
+
+    assert await cleaner.clean_chunk_async("", "原文") == "清洗结果"
+
+
+async def test_complete_response_is_cached(tmp_path):
+    model = StubModel(make_response("清洗结果"))
+    cleaner = make_api_cleaner(tmp_path, model)
+
+    assert await cleaner.clean_chunk_async("", "原文") == "清洗结果"
+    # 第二次命中缓存，不再调用 API
+    assert await cleaner.clean_chunk_async("", "原文") == "清洗结果"
+    assert model.calls == 1
+
+
+async def test_truncated_response_is_not_cached(tmp_path):
+    model = StubModel(
+        make_response("截断的结果", finish_reason="MAX_TOKENS"),
+        make_response("完整结果"),
+    )
+    cleaner = make_api_cleaner(tmp_path, model)
+
+    assert await cleaner.clean_chunk_async("", "原文") == "截断的结果"
+    assert await cleaner.clean_chunk_async("", "原文") == "完整结果"
+    assert model.calls == 2
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        google_exceptions.TooManyRequests("429"),
+        google_exceptions.ServiceUnavailable("503"),
+    ],
+)
+async def test_retryable_error_is_retried(tmp_path, error):
+    model = StubModel(error, make_response("清洗结果"))
+    cleaner = make_api_cleaner(tmp_path, model)
+
+    assert await cleaner.clean_chunk_async("", "原文") == "清洗结果"
+    assert model.calls == 2
+
+
+async def test_non_retryable_error_returns_original(tmp_path):
+    model = StubModel(google_exceptions.InvalidArgument("400"))
+    cleaner = make_api_cleaner(tmp_path, model)
+
+    assert await cleaner.clean_chunk_async("", "原文") == "原文"
+    assert model.calls == 1
+
+
+async def test_exhausted_retries_return_original(tmp_path):
+    model = StubModel(google_exceptions.ServiceUnavailable("503"))
+    cleaner = make_api_cleaner(tmp_path, model)
+
+    assert await cleaner.clean_chunk_async("", "原文") == "原文"
+    assert model.calls == cleaner.max_retries
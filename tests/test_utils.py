@@ -0,0 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cleanmd.utils import write_text_atomic
+
+
+def test_write_text_atomic_replaces_content(tmp_path):
+    target = tmp_path / "out.md"
+    target.write_text("旧内容", encoding="utf-8")
+
+    write_text_atomic(target, "新内容")
+
+    assert target.read_text(encoding="utf-8") == "新内容"
+    assert list(tmp_path.iterdir()) == [target]
+
+
+def test_write_text_atomic_concurrent_writers(tmp_path):
+    target = tmp_path / "out.md"
+    contents = [f"内容 {i}" for i in range(50)]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda text: write_text_atomic(target, text), contents))
+
+    assert target.read_text(encoding="utf-8") in contents
+    assert list(tmp_path.iterdir()) == [target]
+
+
+def test_write_text_atomic_failure_leaves_no_temp_file(tmp_path):
+    target = tmp_path / "out.md"
+
+    # 单独的代理字符无法编码为 UTF-8，写入中途失败
+    with pytest.raises(UnicodeEncodeError):
+        write_text_atomic(target, "\ud800")
+
+    assert list(tmp_path.iterdir()) == []